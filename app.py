@@ -1,15 +1,33 @@
-from flask import Flask, request, jsonify
-import csv
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
+import threading
+import time
 from datetime import datetime
+from types import SimpleNamespace
 import logging
+import orjson
+from flask.json.provider import DefaultJSONProvider
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Provider JSON basato su orjson: anche le jsonify() residue (errori,
+    # risposte piccole) usano l'encoder C invece di quello stdlib.
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
-logging.basicConfig(level=logging.INFO)
+app.json = OrjsonProvider(app)
+# Livello configurabile da env: in produzione INFO, per il debug verboso
+# delle richieste basta LOG_LEVEL=DEBUG.
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-BOOKINGS_FILE = 'prenotazioni.csv'
 PORT = int(os.environ.get('PORT', 5000))
 
 TIME_SLOTS = [
@@ -17,57 +35,201 @@ TIME_SLOTS = [
     "11:00",
     "12:00"
 ]
+# Indice inverso precalcolato: lookup O(1) invece di TIME_SLOTS.index().
+TIME_SLOT_TO_ID = {slot: i for i, slot in enumerate(TIME_SLOTS)}
+
+
+def jout(obj, status=200):
+    # Serializzazione con orjson (C, molto più veloce di json) e Response
+    # diretta: usata sui percorsi GET caldi, jsonify resta per gli errori.
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+# Metà statica della home, costruita una sola volta all'import; la parte
+# viva (available_slots) viene fusa al momento della risposta.
+_HOME_STATIC = {
+    'service': 'Quixa callback booking',
+    'endpoints': {
+        'GET /slots': 'stato di tutti gli slot',
+        'GET /available': 'slot disponibili',
+        'GET /available-mongo': 'slot disponibili (da MongoDB)',
+        'POST /convy-booking': 'prenota uno slot',
+        'POST /cancel': 'cancella le prenotazioni di un phone_number',
+        'GET /phone-exists': 'verifica se un numero ha prenotazioni',
+        'GET /bookings': 'elenco prenotazioni',
+        'GET /health': 'stato del servizio'
+    },
+    'time_slots': TIME_SLOTS
+}
+
+# Bytes della home già serializzati, rinnovati solo quando la cache del
+# set prenotati viene ricaricata (confronto per identità sul dict).
+_home_cache = {'key': None, 'bytes': None}
+
+# Per /health cambia solo il conteggio: prefisso e suffisso pre-codificati,
+# si concatena solo l'intero.
+_HEALTH_PREFIX = b'{"status":"healthy","available_slots":'
+_HEALTH_SUFFIX = b'}'
+
+
+# Cache TTL+versione per il set di slot prenotati: le letture diventano un
+# lookup in memoria finché non scrive questo worker (bump di versione) o non
+# scade il TTL, che limita comunque la staleness tra worker diversi.
+CACHE_TTL = 2.0
+_avail_cache = {'version': -1, 'ts': 0.0, 'value': None}
+_write_version = 0
+
+
+def _bump_write_version():
+    global _write_version
+    _write_version += 1
+
+
+# Single-flight: su un cache miss concorrente un solo worker interroga
+# Mongo, gli altri aspettano il suo risultato invece di accodare N find
+# identiche (thundering herd).
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _booked_cached():
+    if (_avail_cache['value'] is not None
+            and _avail_cache['version'] == _write_version
+            and time.monotonic() - _avail_cache['ts'] < CACHE_TTL):
+        return _avail_cache['value']
+
+    with _inflight_lock:
+        entry = _inflight.get('avail')
+        leader = entry is None
+        if leader:
+            entry = SimpleNamespace(event=threading.Event(), result=None)
+            _inflight['avail'] = entry
+
+    if not leader:
+        entry.event.wait(timeout=2)
+        if entry.result is not None:
+            return entry.result
+        # Il leader è fallito o il timeout è scaduto: query diretta.
+        return booking_service._booked_from_mongo()
+
+    try:
+        version = _write_version
+        booked = booking_service._booked_from_mongo()
+        _avail_cache['value'] = booked
+        _avail_cache['version'] = version
+        _avail_cache['ts'] = time.monotonic()
+        entry.result = booked
+        return booked
+    finally:
+        # try/finally: anche in caso di eccezione i waiter vengono sbloccati.
+        entry.event.set()
+        with _inflight_lock:
+            _inflight.pop('avail', None)
+
 
 MONGO_URI = os.environ.get('MONGO_URI')
 if not MONGO_URI:
     logger.error("MONGO_URI non impostata. Terminare.")
     exit(1)
 
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client['quixa']
-quixa_collection = db.quixa_callback
+DB_NAME = 'quixa'
+
+# Client creato in modo lazy e con connect=False: sotto gunicorn prefork il
+# modulo può essere importato nel master, e un MongoClient già connesso
+# ereditato attraverso la fork corrompe il pool. Così ogni worker apre i
+# propri socket al primo utilizzo.
+_mongo_client = None
+_mongo_lock = threading.Lock()
+_indexes_ready = False
+
+
+def get_mongo():
+    global _mongo_client
+    if _mongo_client is None:
+        with _mongo_lock:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=50,
+                    minPoolSize=5,
+                    serverSelectionTimeoutMS=1500,
+                    socketTimeoutMS=2000,
+                    connectTimeoutMS=1500,
+                    retryWrites=True,
+                    w=1,
+                    connect=False
+                )
+    return _mongo_client
+
+
+def _ensure_indexes(coll):
+    # Indice unico parziale: Mongo garantisce che uno slot possa avere una
+    # sola prenotazione attiva, anche con richieste concorrenti da più
+    # processi.
+    try:
+        coll.create_index(
+            [('slot_id', 1)],
+            unique=True,
+            name='uniq_booked_slot',
+            partialFilterExpression={'status': 'booked'}
+        )
+        # Stesso predicato della delete_many di cancel_booking: la
+        # cancellazione diventa un IXSCAN invece di una scansione completa.
+        coll.create_index(
+            [('phone_number', 1), ('status', 1)],
+            name='cancel_lookup'
+        )
+        # Per le letture filtrate su status='booked' (/available-mongo).
+        coll.create_index([('status', 1)], name='status_lookup')
+        # Ordinamento di /bookings: top-K dall'indice invece che in memoria.
+        coll.create_index([('booking_date', -1)], name='booking_date_desc')
+    except Exception as e:
+        logger.error(f"Errore creazione indice Mongo: {e}")
 
 
-class BookingService:
-    def __init__(self):
-        self.init_csv_file()
+def get_collection():
+    global _indexes_ready
+    coll = get_mongo()[DB_NAME].quixa_callback
+    if not _indexes_ready:
+        with _mongo_lock:
+            if not _indexes_ready:
+                _ensure_indexes(coll)
+                _indexes_ready = True
+    return coll
+
 
-    def init_csv_file(self):
-        if not os.path.exists(BOOKINGS_FILE):
-            with open(BOOKINGS_FILE, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(['slot_id', 'time_slot', 'user_name', 'phone_number', 'booking_date', 'status'])
-            logger.info("File CSV creato con intestazioni.")
+class BookingService:
+    # MongoDB è l'unico store: l'indice unico parziale rende atomica la
+    # prenotazione e il servizio non tiene più stato locale.
+
+    def _booked_from_mongo(self):
+        # Pipeline di aggregazione: filtro e projection eseguiti dallo
+        # storage engine ($match coperto dall'indice su status), al client
+        # arrivano solo i campi che servono. Mongo resta la fonte
+        # autoritativa: lo stato per-processo diverge tra i worker gunicorn.
+        pipeline = [
+            {'$match': {'status': 'booked'}},
+            {'$project': {'slot_id': 1, 'user_name': 1, 'phone_number': 1,
+                          'booking_date': 1, '_id': 0}}
+        ]
+        cursor = get_collection().aggregate(pipeline)
+        return {
+            doc['slot_id']: {
+                'user_name': doc.get('user_name'),
+                'phone_number': doc.get('phone_number'),
+                'booking_date': doc.get('booking_date')
+            } for doc in cursor
+        }
 
     def get_available_slots(self):
-        booked_slots = set()
-        try:
-            with open(BOOKINGS_FILE, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['status'] == 'booked':
-                        booked_slots.add(int(row['slot_id']))
-        except FileNotFoundError:
-            pass
+        booked_slots = _booked_cached()
         return [
             {'slot_id': i, 'time_slot': slot, 'available': True}
             for i, slot in enumerate(TIME_SLOTS) if i not in booked_slots
         ]
 
     def get_all_slots_status(self):
-        booked_slots = {}
-        try:
-            with open(BOOKINGS_FILE, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if row['status'] == 'booked':
-                        booked_slots[int(row['slot_id'])] = {
-                            'user_name': row['user_name'],
-                            'phone_number': row['phone_number'],
-                            'booking_date': row['booking_date']
-                        }
-        except FileNotFoundError:
-            pass
+        booked_slots = _booked_cached()
         return [
             {
                 'slot_id': i,
@@ -78,57 +240,59 @@ class BookingService:
         ]
 
     def is_slot_available(self, slot_id):
-        try:
-            with open(BOOKINGS_FILE, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    if int(row['slot_id']) == slot_id and row['status'] == 'booked':
-                        return False
-        except FileNotFoundError:
-            pass
-        return True
+        # count_documents con limit=1: lookup indicizzato lato server con
+        # short-circuit alla prima occorrenza.
+        return get_collection().count_documents(
+            {'slot_id': int(slot_id), 'status': 'booked'}, limit=1
+        ) == 0
+
+    def available_count(self):
+        return len(TIME_SLOTS) - len(_booked_cached())
 
     def book_slot(self, slot_id, user_name, phone_number):
+        # slot_id può arrivare come stringa ("0") da certi client: coercizione
+        # e controllo di range prima di qualsiasi I/O, invece di un TypeError
+        # che finirebbe in un 500 con traceback completo nei log.
+        try:
+            slot_id = int(slot_id)
+        except (TypeError, ValueError):
+            return False, "Slot ID non valido"
         if slot_id < 0 or slot_id >= len(TIME_SLOTS):
             return False, "Slot ID non valido"
 
-        if not self.is_slot_available(slot_id):
-            return False, "Slot già prenotato"
-
-        booking_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        with open(BOOKINGS_FILE, 'a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                slot_id,
-                TIME_SLOTS[slot_id],
-                user_name,
-                phone_number,
-                booking_date,
-                'booked'
-            ])
-        logger.info(f"Slot {slot_id} prenotato da {user_name}")
+        # datetime nativo: PyMongo lo salva come BSON Date, più compatto di
+        # una stringa e ordinabile/indicizzabile come data vera. Niente più
+        # strftime sul percorso di scrittura.
+        booking_date = datetime.now()
+        doc = {
+            "slot_id": slot_id,
+            "time_slot": TIME_SLOTS[slot_id],
+            "user_name": user_name,
+            "phone_number": phone_number,
+            "booking_date": booking_date,
+            "status": "booked"
+        }
 
+        # Niente check-then-write: l'insert è l'unica operazione e l'indice
+        # unico parziale rifiuta atomicamente la doppia prenotazione.
         try:
-            doc = {
-                "slot_id": slot_id,
-                "time_slot": TIME_SLOTS[slot_id],
-                "user_name": user_name,
-                "phone_number": phone_number,
-                "booking_date": booking_date,
-                "status": "booked"
-            }
-            quixa_collection.insert_one(doc)
-            logger.info(f"Prenotazione inserita in MongoDB per slot {slot_id}")
+            get_collection().insert_one(doc)
+        except DuplicateKeyError:
+            return False, "Slot già prenotato"
         except Exception as e:
             logger.error(f"Errore inserimento MongoDB: {e}")
+            return False, "Errore durante la prenotazione."
+
+        _bump_write_version()
+        logger.info(f"Slot {slot_id} prenotato da {user_name}")
 
         return True, "Prenotazione confermata"
 
     def cancel_booking(self, phone_number):
         try:
-            result = quixa_collection.delete_many({"phone_number": phone_number, "status": "booked"})
+            result = get_collection().delete_many({"phone_number": phone_number, "status": "booked"})
             if result.deleted_count > 0:
+                _bump_write_version()
                 logger.info(f"Prenotazioni rimosse da MongoDB per phone_number {phone_number}")
                 return True, f"{result.deleted_count} prenotazioni cancellate."
             else:
@@ -141,11 +305,29 @@ class BookingService:
 
 booking_service = BookingService()
 
+@app.route('/', methods=['GET'])
+def home():
+    booked = _booked_cached()
+    if _home_cache['key'] is not booked:
+        payload = {
+            **_HOME_STATIC,
+            'available_slots': [slot for i, slot in enumerate(TIME_SLOTS)
+                                if i not in booked]
+        }
+        _home_cache['bytes'] = orjson.dumps(payload)
+        _home_cache['key'] = booked
+    return Response(_home_cache['bytes'], mimetype='application/json')
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    available = booking_service.available_count()
+    return Response(_HEALTH_PREFIX + str(available).encode() + _HEALTH_SUFFIX,
+                    mimetype='application/json')
+
 @app.route('/slots', methods=['GET'])
 def get_slots():
     try:
-        slots = booking_service.get_all_slots_status()
-        return jsonify({'status': 'success', 'slots': slots}), 200
+        return jout({'status': 'success', 'slots': booking_service.get_all_slots_status()})
     except Exception as e:
         logger.error(f"Errore get_slots: {e}")
         return jsonify({'error': str(e)}), 500
@@ -153,30 +335,22 @@ def get_slots():
 @app.route('/available', methods=['GET'])
 def get_available():
     try:
-        available = booking_service.get_available_slots()
-        return jsonify({'status': 'success', 'available_slots': available}), 200
+        return jout({'status': 'success', 'available_slots': booking_service.get_available_slots()})
     except Exception as e:
         logger.error(f"Errore get_available: {e}")
         return jsonify({'error': str(e)}), 500
 
-# SOSTITUISCI IL TUO ENDPOINT /convy-booking CON QUESTO:
 @app.route('/available-mongo', methods=['GET'])
 def available_slots():
     try:
-        # Lista completa degli slot orari disponibili
-        all_slots = ["10:00", "11:00", "12:00"]
-
-        # Recupera i time_slot già prenotati dal DB (status = booked)
-        booked = quixa_collection.find(
-            {'status': 'booked'},
-            {'time_slot': 1, '_id': 0}
-        )
-        booked_slots = [b['time_slot'] for b in booked]
+        # Stesso percorso dati degli altri endpoint di lettura (cache TTL
+        # + single-flight); TIME_SLOTS è l'unica definizione degli orari e
+        # il test di appartenenza è un lookup O(1) sul dict dei prenotati.
+        booked_ids = _booked_cached()
+        available_slots = [slot for i, slot in enumerate(TIME_SLOTS)
+                           if i not in booked_ids]
 
-        # Filtra solo gli slot ancora disponibili
-        available_slots = [slot for slot in all_slots if slot not in booked_slots]
-
-        return jsonify({'available_slots': available_slots}), 200
+        return jout({'available_slots': available_slots})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -185,65 +359,59 @@ def available_slots():
 @app.route('/convy-booking', methods=['POST'])
 def convy_booking():
     try:
-        # Log di tutto quello che arriva
-        logger.info("="*50)
-        logger.info("🔍 NUOVA RICHIESTA /convy-booking")
-        logger.info(f"📥 Headers ricevuti: {dict(request.headers)}")
-        logger.info(f"📥 Content-Type: {request.content_type}")
-        logger.info(f"📥 Method: {request.method}")
-        
+        # Dettagli della richiesta solo a livello DEBUG: formattazione lazy
+        # con %s, niente f-string valutate a prescindere dal livello.
+        logger.debug("🔍 NUOVA RICHIESTA /convy-booking (Content-Type: %s)",
+                     request.content_type)
+
         # Prova a leggere i dati JSON
         try:
             data = request.get_json(force=True)  # force=True per sicurezza
-            logger.info(f"📦 Dati JSON ricevuti: {data}")
-            logger.info(f"📦 Tipo dati: {type(data)}")
+            logger.debug("📦 Dati JSON ricevuti: %s", data)
         except Exception as json_error:
-            logger.error(f"❌ Errore parsing JSON: {json_error}")
-            logger.info(f"📦 Raw data: {request.get_data()}")
+            logger.error("❌ Errore parsing JSON: %s", json_error)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📦 Raw data: %s", request.get_data())
             return jsonify({'error': 'Dati JSON non validi', 'details': str(json_error)}), 400
-        
+
         if not data:
             logger.error("❌ Nessun dato ricevuto")
             return jsonify({'error': 'Nessun dato ricevuto'}), 400
-            
+
         # Estrai i parametri
         slot_scelto = data.get('slot_scelto')
         user_name = data.get('user_name')
         phone_number = data.get('phone_number')
-        
-        logger.info(f"🎯 slot_scelto: '{slot_scelto}' (type: {type(slot_scelto)})")
-        logger.info(f"👤 user_name: '{user_name}' (type: {type(user_name)})")
-        logger.info(f"📧 phone_number: '{phone_number}' (type: {type(phone_number)})")
+
+        logger.debug("🎯 slot_scelto=%r user_name=%r phone_number=%r",
+                     slot_scelto, user_name, phone_number)
 
         # Validazione rigorosa
         if slot_scelto is None:
-            logger.error("❌ slot_scelto è None")
+            logger.warning("❌ slot_scelto è None")
             return jsonify({'error': 'slot_scelto è obbligatorio e non può essere None'}), 400
-            
+
         if not user_name:
-            logger.error(f"❌ user_name vuoto o None: '{user_name}'")
+            logger.warning("❌ user_name vuoto o None: %r", user_name)
             return jsonify({'error': 'user_name è obbligatorio'}), 400
-            
+
         if not phone_number:
-            logger.error(f"❌ phone_number vuoto o None: '{phone_number}'")
+            logger.warning("❌ phone_number vuoto o None: %r", phone_number)
             return jsonify({'error': 'phone_number è obbligatorio'}), 400
 
-        # Controlla se lo slot è valido
-        logger.info(f"🕐 TIME_SLOTS disponibili: {TIME_SLOTS}")
-        
-        if slot_scelto not in TIME_SLOTS:
-            logger.error(f"❌ Slot non valido: '{slot_scelto}' non è in {TIME_SLOTS}")
+        # Controlla se lo slot è valido (validazione + lookup in un solo
+        # accesso al dizionario precalcolato)
+        slot_id = TIME_SLOT_TO_ID.get(slot_scelto)
+        if slot_id is None:
+            logger.warning("❌ Slot non valido: %r non è in %s", slot_scelto, TIME_SLOTS)
             return jsonify({
                 'error': 'slot_scelto non valido',
                 'slot_ricevuto': slot_scelto,
                 'slots_validi': TIME_SLOTS
             }), 400
 
-        slot_id = TIME_SLOTS.index(slot_scelto)
-        logger.info(f"✅ Slot ID trovato: {slot_id} per slot '{slot_scelto}'")
-
-        # Costruisci documento MongoDB
-        booking_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # Costruisci documento MongoDB (booking_date come BSON Date)
+        booking_date = datetime.now()
         doc = {
             "slot_id": slot_id,
             "time_slot": slot_scelto,
@@ -251,57 +419,39 @@ def convy_booking():
             "phone_number": phone_number,
             "booking_date": booking_date,
             "status": "booked",
-            "source": "ConvyAI",
-            "raw_request": data  # Per debug
+            "source": "ConvyAI"
+            # Niente raw_request: raddoppiava il payload di ogni documento
+            # e faceva trapelare dati personali in ogni find successiva.
         }
-        
-        logger.info(f"📄 Documento da inserire in MongoDB: {doc}")
 
-        # Test connessione MongoDB
-        try:
-            mongo_client.admin.command('ping')
-            logger.info("✅ MongoDB ping riuscito")
-            logger.info(f"🗄️ Database: {db.name}")
-            logger.info(f"📝 Collection: quixa_callback")
-        except Exception as ping_error:
-            logger.error(f"❌ MongoDB ping fallito: {ping_error}")
-            return jsonify({
-                'error': 'MongoDB non raggiungibile', 
-                'details': str(ping_error)
-            }), 500
+        logger.debug("📄 Documento da inserire in MongoDB: %s", doc)
 
-        # Inserimento in MongoDB
+        # Inserimento in MongoDB: insert_one solleva già un'eccezione in caso
+        # di fallimento, la rilettura di verifica e il conteggio di debug
+        # erano solo round-trip in più.
         try:
-            logger.info("💾 Inizio inserimento in MongoDB...")
-            result = quixa_collection.insert_one(doc)
+            result = get_collection().insert_one(doc)
             mongo_id = str(result.inserted_id)
-            logger.info(f"✅ Documento inserito! MongoDB ID: {mongo_id}")
-            
-            # Verifica inserimento
-            verification = quixa_collection.find_one({"_id": result.inserted_id})
-            if verification:
-                logger.info("✅ Documento verificato correttamente in MongoDB")
-                # Rimuovi il campo raw_request dalla risposta
-                verification.pop('raw_request', None)
-                verification['_id'] = str(verification['_id'])
-            else:
-                logger.warning("⚠️ Documento non trovato dopo l'inserimento")
-                
+            _bump_write_version()
+            logger.info("✅ Prenotazione slot %s per %s (MongoDB ID: %s)",
+                        slot_id, user_name, mongo_id)
+        except DuplicateKeyError:
+            # L'indice unico parziale ha rifiutato la doppia prenotazione:
+            # risposta 409, non un errore del server.
+            logger.warning("❌ Slot %s già prenotato", slot_id)
+            return jsonify({
+                'error': 'Slot già prenotato',
+                'slot_id': slot_id,
+                'time_slot': slot_scelto
+            }), 409
         except Exception as insert_error:
-            logger.error(f"❌ Errore inserimento MongoDB: {insert_error}")
-            logger.error(f"❌ Tipo errore: {type(insert_error)}")
+            logger.error("❌ Errore inserimento MongoDB (%s): %s",
+                         type(insert_error).__name__, insert_error)
             return jsonify({
-                'error': 'Errore durante il salvataggio in MongoDB', 
+                'error': 'Errore durante il salvataggio in MongoDB',
                 'details': str(insert_error)
             }), 500
 
-        # Conta totale documenti per debug
-        try:
-            total_count = quixa_collection.count_documents({})
-            logger.info(f"📊 Totale documenti nella collection: {total_count}")
-        except Exception as count_error:
-            logger.warning(f"⚠️ Errore conteggio documenti: {count_error}")
-
         # Risposta di successo
         response = {
             'status': 'success', 
@@ -311,24 +461,21 @@ def convy_booking():
                 'time_slot': slot_scelto,
                 'user_name': user_name,
                 'phone_number': phone_number,
-                'booking_date': booking_date
+                # La stringa leggibile viene formattata solo qui, in risposta.
+                'booking_date': booking_date.strftime('%Y-%m-%d %H:%M:%S')
             },
             'mongodb_id': mongo_id,
-            'database': db.name,
+            'database': DB_NAME,
             'collection': 'quixa_callback'
         }
         
-        logger.info(f"✅ Risposta finale: {response}")
-        logger.info("="*50)
-        
+        logger.debug("✅ Risposta finale: %s", response)
+
         return jsonify(response), 200
 
     except Exception as e:
-        logger.error(f"❌ ERRORE GENERALE: {e}")
-        logger.error(f"❌ Tipo errore: {type(e)}")
-        import traceback
-        logger.error(f"❌ Traceback: {traceback.format_exc()}")
-        
+        logger.exception("❌ ERRORE GENERALE in /convy-booking: %s", e)
+
         return jsonify({
             'error': 'Errore interno del server', 
             'details': str(e)
@@ -341,8 +488,10 @@ def phone_exists():
         return jsonify({'error': 'Parametro phone mancante'}), 400
     
     try:
-        exists = quixa_collection.find_one({'phone_number': phone}) is not None
-        return jsonify({'exists': exists}), 200
+        # count_documents con limit=1: Mongo si ferma alla prima occorrenza
+        # sull'indice cancel_lookup, senza trasferire l'intero documento.
+        exists = get_collection().count_documents({'phone_number': phone}, limit=1) > 0
+        return jout({'exists': exists})
     except Exception as e:
         logger.error(f"Errore phone_exists: {e}")
         return jsonify({'error': str(e)}), 500
@@ -352,18 +501,29 @@ def phone_exists():
 @app.route('/bookings', methods=['GET'])
 def get_all_bookings():
     try:
-        # Da MongoDB
-        mongo_bookings = list(quixa_collection.find({}).sort("booking_date", -1))
-        for booking in mongo_bookings:
-            booking['_id'] = str(booking['_id'])
-            booking.pop('raw_request', None)  # Rimuovi dati di debug
-            
-        return jsonify({
-            'status': 'success',
-            'mongodb_count': len(mongo_bookings),
-            'bookings': mongo_bookings
-        }), 200
-        
+        # Risposta in streaming: i documenti vengono serializzati batch per
+        # batch dal cursore invece di materializzare l'intera collection in
+        # memoria prima di rispondere.
+        def generate():
+            cursor = (
+                get_collection()
+                .find({}, {'raw_request': 0})
+                .sort("booking_date", -1)
+                .limit(200)
+                .batch_size(500)
+            )
+            yield b'{"status":"success","bookings":['
+            first = True
+            for booking in cursor:
+                booking['_id'] = str(booking['_id'])
+                if not first:
+                    yield b','
+                yield orjson.dumps(booking, default=str)
+                first = False
+            yield b']}'
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
     except Exception as e:
         logger.error(f"Errore get_all_bookings: {e}")
         return jsonify({'error': str(e)}), 500
@@ -396,5 +556,7 @@ def cancel_booking():
 
 
 if __name__ == '__main__':
-    logger.info(f"Server Flask in ascolto sulla porta {PORT}...")
+    # Solo per sviluppo locale: in produzione il server è gunicorn con
+    # worker gthread (vedi Procfile), che gestisce richieste concorrenti.
+    logger.info(f"Server Flask di sviluppo in ascolto sulla porta {PORT}...")
     app.run(host='0.0.0.0', port=PORT)